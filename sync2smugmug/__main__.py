@@ -1,9 +1,15 @@
 import asyncio
 import logging
 
-from sync2smugmug import sync
+try:
+    import uvloop
+except ImportError:
+    # uvloop is optional (faster event loop, not available on all platforms)
+    uvloop = None
+
+from sync2smugmug import sync, event_manager
 from sync2smugmug.online import online
-from sync2smugmug.configuration import config
+from sync2smugmug.configuration import config, get_cache_dir
 from sync2smugmug.optimizations.disk import execute_optimizations as disk_optimizations
 from sync2smugmug.optimizations.online import execute_optimizations as online_optimizations
 from sync2smugmug.scan import disk_scanner, online_scanner
@@ -22,26 +28,34 @@ async def main():
     if sync_action.optimize_on_disk:
         await disk_optimizations.run_disk_optimizations(dry_run=config.dry_run)
 
-    async with online.connect(config.connection_params) as connection:
-        if sync_action.optimize_online:
-            await online_optimizations.run_online_optimizations(connection=connection, dry_run=config.dry_run)
-
-        if sync_action.upload or sync_action.download:
-            on_disk = await disk_scanner.scan(base_dir=config.base_dir)
-            logger.info(f"Scan results (on disk): {on_disk.stats}")
-
-            on_smugmug = await online_scanner.scan(connection=connection)
-            logger.info(f"Scan results (on smugmug): {on_smugmug.stats}")
-
-            await sync.synchronize(
-                on_disk=on_disk,
-                on_line=on_smugmug,
-                sync_action=sync_action,
-                connection=connection,
-                dry_run=config.dry_run
-            )
-
-            sync.print_summary(on_disk, on_smugmug)
-
-
-asyncio.run(main())
+    async with online.connect(config.connection_params, cache_dir=get_cache_dir()) as connection:
+        try:
+            if sync_action.optimize_online:
+                await online_optimizations.run_online_optimizations(connection=connection, dry_run=config.dry_run)
+
+            if sync_action.upload or sync_action.download:
+                # The two scans are independent, run them side by side
+                on_disk, on_smugmug = await asyncio.gather(
+                    disk_scanner.scan(base_dir=config.base_dir),
+                    online_scanner.scan(connection=connection),
+                )
+                logger.info(f"Scan results (on disk): {on_disk.stats}")
+                logger.info(f"Scan results (on smugmug): {on_smugmug.stats}")
+
+                await sync.synchronize(
+                    on_disk=on_disk,
+                    on_line=on_smugmug,
+                    sync_action=sync_action,
+                    connection=connection,
+                    dry_run=config.dry_run
+                )
+
+                sync.print_summary(on_disk, on_smugmug)
+
+        finally:
+            # Stop handling events before the connection (which the handlers use) is closed
+            await event_manager.shutdown()
+
+
+with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop is not None else None) as runner:
+    runner.run(main())
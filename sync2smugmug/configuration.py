@@ -1,5 +1,6 @@
 import dataclasses
 import logging
+import os
 import sys
 from pathlib import Path
 from typing import List
@@ -46,6 +47,15 @@ def get_config_files() -> List[Path]:
     ]
 
 
+def get_cache_dir() -> Path:
+    """
+    Directory for data kept between runs that is not configuration (e.g. cached Smugmug responses). Kept out of the
+    photos directory, so it is never mistaken for content
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    return Path(cache_home).joinpath("sync2smugmug") if cache_home else Path.home().joinpath(".cache", "sync2smugmug")
+
+
 def parse_command_line() -> configargparse.Namespace:
     """
     Define the command line parser and load configuration files into it
@@ -8,16 +8,19 @@ from pathlib import Path, PurePath
 from typing import ClassVar, Generator, Tuple, List
 
 from sync2smugmug import models, protocols
-from sync2smugmug.utils import image_tools
+from sync2smugmug.utils import image_tools, general_tools
 
 logger = logging.getLogger(__name__)
 
+SYNC_TIME_DELTA = 360.0  # 360 seconds to allow between online and disk clocks
+
 
 @dataclass
 class SyncData:
     sync_time: float
     online_time: float
     disk_time: float
+    content_hash: str | None = None
 
 
 @dataclass
@@ -61,12 +64,55 @@ class DiskAlbumInfo:
 
         return self.sync_data.disk_time
 
+    @property
+    def content_hash(self) -> str | None:
+        if self.sync_data is None:
+            return None
+
+        return self.sync_data.content_hash
+
     @property
     def last_updated(self) -> float:
         return self.disk_path.lstat().st_mtime
 
-    def remember_sync(self, online_time: float | None):
-        """ Update sync and disk time and persist it to disk """
+    @property
+    def synced_online_time(self) -> float | None:
+        """
+        The online update time the album was last synced with, provided the album did not change on disk since
+        (None if it was never synced or if it did change)
+        """
+        unchanged, _ = self.unchanged_since_sync()
+        return self.online_time if unchanged else None
+
+    def unchanged_since_sync(self) -> Tuple[bool, str | None]:
+        """
+        Check if the album did not change on disk since the last sync - by its update time, or if that changed, by its
+        content. Nothing is persisted here: when the content had to be checked (and matched), its fresh hash is
+        returned as well, so the caller can record the new disk time with remember_sync (None otherwise)
+        """
+        if self.sync_data is None:
+            return False, None
+
+        if abs(self.disk_time - self.last_updated) <= SYNC_TIME_DELTA:
+            return True, None
+
+        if self.content_hash is None:
+            return False, None
+
+        current_content_hash = self.current_content_hash()
+        if current_content_hash != self.content_hash:
+            return False, None
+
+        return True, current_content_hash
+
+    def current_content_hash(self) -> str:
+        """ A fingerprint of the album's images as they are on disk right now (by name) """
+        return general_tools.content_hash(
+            sorted(image_path.name for image_path, _ in iter_image_files(dir_path_to_scan=self.disk_path))
+        )
+
+    def remember_sync(self, online_time: float | None, content_hash: str | None = None):
+        """ Update sync and disk time and persist it to disk (content hash is computed, unless provided) """
 
         if online_time is not None:
             # Set the sync data and persist to disk
@@ -74,6 +120,7 @@ class DiskAlbumInfo:
                 sync_time=time.time(),
                 online_time=online_time,
                 disk_time=self.disk_path.lstat().st_mtime,  # Capture disk update time at the time of record
+                content_hash=content_hash or self.current_content_hash(),
             )
 
             with self.sync_file_path.open("w") as f:
@@ -132,7 +179,7 @@ def delete_image_from_disk(image: models.Image, dry_run: bool):
     if not dry_run:
         image.disk_info.disk_path.unlink()
 
-    logger.info(f"Deleted image {image}")
+    logger.info("Deleted image %s", image)
 
 
 def iter_image_files(dir_path_to_scan: Path) -> Generator[Tuple[Path, Path], None, None]:
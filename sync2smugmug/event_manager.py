@@ -1,9 +1,9 @@
 import asyncio
 import functools
 import logging
-from collections import defaultdict
+from collections import defaultdict, Counter
 from dataclasses import dataclass, field
-from typing import Callable, Any, Coroutine, Dict, Set
+from typing import Callable, Any, Coroutine, Dict, Set, List
 
 from sync2smugmug import events
 
@@ -13,6 +13,11 @@ logger = logging.getLogger(__name__)
 EventHandler = Callable[[Any, bool], Coroutine]
 
 
+# How many events can be processed at the same time. This is limited so there is no risk for a deadlock in lower level
+# actions
+EVENT_CONSUMERS = 10
+
+
 @dataclass
 class EventsTracker:
     """
@@ -20,52 +25,75 @@ class EventsTracker:
     All events will be executed asynchronously (allowing more than one handler to register for an event)
     """
     event_handlers: Dict[str, Set[EventHandler]] = field(default_factory=lambda: defaultdict(set))
-    tasks = []
+
+    # Events waiting to be processed, the consumer tasks that process them and errors raised by the handlers
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+    consumers: List[asyncio.Task] = field(default_factory=list)
+    errors: List[Exception] = field(default_factory=list)
 
     # Keep track of event types fired (for summary print-out)
-    event_count_by_type: Dict = field(default_factory=lambda: defaultdict(int))
+    event_count_by_type: Counter = field(default_factory=Counter)
     total_submitted: int = 0
     total_processed: int = 0
 
 
 the_events_tracker: EventsTracker = EventsTracker()
-_concurrency_limiter = asyncio.Semaphore(10)
 
 
 async def fire_event(event: str, event_data: events.EventData, dry_run: bool):
     """
-    Log an event for async processing.
+    Log an event for async processing. This only queues the event (it is handled by the consumers, in the background)
     """
     if logger.isEnabledFor(logging.DEBUG):
-        logger.debug(f"!---- Event fired: {event} - {event_data} ----!")
+        logger.debug("!---- Event fired: %s - %s ----!", event, event_data)
 
-    # Call all listeners asynchronously (keep track of tasks, so we can wait on them later)
-    async_task = asyncio.create_task(
-        handle_event(event=event, event_data=event_data, dry_run=dry_run)
-    )
-    the_events_tracker.tasks.append(async_task)
+    # The consumers are shared by all events - start them with the first one
+    if not the_events_tracker.consumers:
+        the_events_tracker.consumers = [asyncio.create_task(_consume_events()) for _ in range(EVENT_CONSUMERS)]
+
+    the_events_tracker.queue.put_nowait((event, event_data, dry_run))
 
     # Update bookkeeping
     the_events_tracker.total_submitted += 1
     the_events_tracker.event_count_by_type[event] += 1
 
 
-async def handle_event(event: str, event_data: events.EventData, dry_run: bool):
+async def _consume_events():
     """
-    Called asynchronously (via asyncio.create_task) to handle an event. This will call all call back each of the
-    registered handlers with the event data.
+    Take events off the queue and handle them (runs until cancelled). Errors are kept, to be raised by join
+    """
+    queue = the_events_tracker.queue
+    error_enabled = logger.isEnabledFor(logging.ERROR)
+
+    while True:
+        event, event_data, dry_run = await queue.get()
+
+        try:
+            await handle_event(event=event, event_data=event_data, dry_run=dry_run)
+
+        except Exception as e:  # noqa
+            # Log each error as it happens (join raises them all together, once everything is done)
+            if error_enabled:
+                logger.error("Failed handling event %s - %s", event, event_data, exc_info=e)
+
+            the_events_tracker.errors.append(e)
 
-    Concurrency (how many events can be processed at the same time) is limited here so there is no risk for a deadlock
-    in lower level actions.
+        finally:
+            queue.task_done()
+
+
+async def handle_event(event: str, event_data: events.EventData, dry_run: bool):
     """
-    async with _concurrency_limiter:
-        handlers = the_events_tracker.event_handlers.get(event) or []
+    Called by the event consumers to handle an event. This will call all call back each of the registered handlers
+    with the event data.
+    """
+    handlers = the_events_tracker.event_handlers.get(event) or []
 
-        # Allow each of the event_handlers to process the event
-        for handler in handlers:
-            await handler(event_data, dry_run)
+    # Allow each of the event_handlers to process the event
+    for handler in handlers:
+        await handler(event_data, dry_run)
 
-        the_events_tracker.total_processed += 1
+    the_events_tracker.total_processed += 1
 
 
 def subscribe(*event_tags):
@@ -92,16 +120,32 @@ async def join():
     """
     Wait until all events submitted are processed.
 
-    Since events can (and often are) be fired from within other event handlers, we will continue waiting until the
-    queue is finally empty. This is done by repeatedly calling 'gather' with a slice from the queue - until the queue
-    is exhausted.
+    Since events can (and often are) be fired from within other event handlers, the queue's join takes care of waiting
+    until no event is pending (including ones fired while waiting). If any of the events failed, all errors are raised
+    together as an ExceptionGroup (once everything is done).
+    """
+    await the_events_tracker.queue.join()
+
+    if the_events_tracker.errors:
+        errors = list(the_events_tracker.errors)
+        the_events_tracker.errors.clear()
+        raise ExceptionGroup(f"Failed handling {len(errors)} event(s)", errors)
+
+
+async def shutdown():
     """
-    #
-    while len(the_events_tracker.tasks) > 0:
-        slice_size = min(len(the_events_tracker.tasks), 100)
+    Stop the event consumers (call once done with events). Events still pending are dropped.
+    """
+    consumers = the_events_tracker.consumers
+    the_events_tracker.consumers = []
+
+    for consumer in consumers:
+        consumer.cancel()
 
-        # Take a piece of the events
-        a_slice = the_events_tracker.tasks[:slice_size]
-        the_events_tracker.tasks = the_events_tracker.tasks[slice_size:]
+    await asyncio.gather(*consumers, return_exceptions=True)
 
-        await asyncio.gather(*a_slice)
+    # Drop whatever was not processed, so the queue does not count it as unfinished
+    queue = the_events_tracker.queue
+    while not queue.empty():
+        queue.get_nowait()
+        queue.task_done()
@@ -29,7 +29,7 @@ async def upload_folder(event_data: events.FolderEventData, dry_run: bool) -> bo
     )
 
     # Update hierarchy with new folder
-    event_data.target_parent.sub_folders[folder.name] = folder
+    event_data.target_parent.add_sub_folder(folder)
 
     # Trigger an event for each sub folder
     for sub_folder in event_data.source_folder.sub_folders.values():
@@ -83,7 +83,7 @@ async def download_folder(event_data: events.FolderEventData, dry_run: bool):
         disk_info=disk_info,
     )
 
-    event_data.target_parent.sub_folders[folder.name] = folder
+    event_data.target_parent.add_sub_folder(folder)
 
     # Trigger an event for each sub folder
     for sub_folder in event_data.source_folder.sub_folders.values():
@@ -126,7 +126,7 @@ async def delete_folder_on_disk(event_data: events.DeleteFolderEventData, dry_ru
     # Update the data model
     del event_data.parent.sub_folders[event_data.target.name]
 
-    logger.info(f"Deleted {event_data.target} (dry_run={dry_run})")
+    logger.info("Deleted %s (dry_run=%s)", event_data.target, dry_run)
 
     return True
 
@@ -139,7 +139,7 @@ async def delete_album_on_disk(event_data: events.DeleteAlbumEventData, dry_run:
     # Update the data model
     del event_data.parent.albums[event_data.target.name]
 
-    logger.info(f"Deleted {event_data.target} (dry_run={dry_run})")
+    logger.info("Deleted %s (dry_run=%s)", event_data.target, dry_run)
 
     return True
 
@@ -149,7 +149,7 @@ async def delete_folder_online(event_data: events.DeleteFolderEventData, dry_run
     changed = await event_data.connection.delete(uri=event_data.target.online_info.uri, dry_run=dry_run)
     del event_data.parent.sub_folders[event_data.target.name]
 
-    logger.info(f"Deleted {event_data.target} (dry_run={dry_run})")
+    logger.info("Deleted %s (dry_run=%s)", event_data.target, dry_run)
 
     return changed
 
@@ -159,7 +159,7 @@ async def delete_album_online(event_data: events.DeleteAlbumEventData, dry_run:
     changed = await event_data.connection.delete(uri=event_data.target.online_info.uri, dry_run=dry_run)
     del event_data.parent.albums[event_data.target.name]
 
-    logger.info(f"Deleted {event_data.target} (dry_run={dry_run})")
+    logger.info("Deleted %s (dry_run=%s)", event_data.target, dry_run)
 
     return changed
 
@@ -179,7 +179,7 @@ async def upload_album(event_data: events.AlbumEventData, dry_run: bool) -> bool
         online_info=online_info,
     )
 
-    event_data.target_parent.albums[album.name] = album
+    event_data.target_parent.add_album(album)
 
     # Upload the images for this source_album
     any_change = await online.upload_missing_images(
@@ -208,7 +208,7 @@ async def download_album(event_data: events.AlbumEventData, dry_run: bool) -> bo
     )
 
     disk_album = models.Album(relative_path=online_album.relative_path, disk_info=disk_info)
-    disk_parent_folder.albums[disk_album.name] = disk_album
+    disk_parent_folder.add_album(disk_album)
 
     changed = await online.download_missing_images(
         from_online_album=online_album,
@@ -253,16 +253,26 @@ async def sync_albums(event_data: events.SyncAlbumImagesEventData, dry_run: bool
 
     if event_data.sync_action.delete_on_disk:
         # Delete on disk is quick - no need for async tasks
+        online_paths = {image.relative_path for image in event_data.online_album.images}
         for image in event_data.disk_album.images:
             # Lookup image (using relative path)
-            if image not in event_data.online_album.images:
+            if image.relative_path not in online_paths:
                 disk.delete_image_from_disk(image, dry_run=dry_run)
 
     if event_data.sync_action.delete_online:
-        for image in event_data.online_album.images:
-            # Lookup image (using relative path)
-            if image not in event_data.disk_album.images:
-                await event_data.connection.delete(uri=image.online_info.uri, dry_run=dry_run)
+        # Lookup images (using relative path), and delete them all using a single request
+        disk_paths = {image.relative_path for image in event_data.disk_album.images}
+        images_to_delete = [
+            image.online_info
+            for image in event_data.online_album.images
+            if image.relative_path not in disk_paths
+        ]
+
+        await event_data.connection.delete_images(
+            album=event_data.online_album.online_info,
+            images=images_to_delete,
+            dry_run=dry_run,
+        )
 
     if changed:
         disk.load_album_images(album=event_data.disk_album)
@@ -4,9 +4,10 @@ from dataclasses import dataclass, field
 from datetime import date, datetime
 from functools import total_ordering, cached_property
 from pathlib import PurePath
-from typing import Dict, ClassVar, Pattern, List
+from typing import Dict, ClassVar, Pattern, List, Tuple
 
 from sync2smugmug import protocols
+from sync2smugmug.utils import general_tools
 
 
 @dataclass(frozen=True)
@@ -98,7 +99,7 @@ class Node(ABC):
 
 
 @total_ordering
-@dataclass
+@dataclass(eq=False)  # Nodes are equal by path (Node.__eq__), not by comparing all fields
 class Album(Node):
     DATE_ALBUM_PATTERN: ClassVar[Pattern[str]] = re.compile(r"([12][90]\d\d_[0-1]\d_[0-3]\d)( - .*)?")
     DATE_ALBUM_FORMAT: ClassVar[str] = "%Y_%m_%d"
@@ -133,6 +134,18 @@ class Album(Node):
         match = re.match(self.DATE_ALBUM_PATTERN, self.name)
         return len(match.groups()) == 1 if match is not None else None
 
+    @property
+    def sync_token(self) -> float | None:
+        """
+        The online update time this album matches. For an online album, it is its last update. For a disk album, it is
+        the online update time it was last synced with (None if never synced or changed on disk since).
+        A disk album and an online album with the same token hold the same images.
+        """
+        if self.is_online:
+            return self.online_info.last_updated
+
+        return self.disk_info.synced_online_time
+
     @property
     def requires_image_load(self) -> bool:
         # Indicates that we didn't load all images to memory yet (this is especially needed for online images
@@ -145,22 +158,21 @@ class Album(Node):
         """
         self.images = None
 
-    def __lt__(self, other):
-        assert isinstance(other, Album)
-
-        # For source_album dates, use the date, then the length of the path as primary sort criteria
-        if self.album_date and other.album_date:
-            if self.album_date < other.album_date:
-                return True
+    @cached_property
+    def sort_key(self) -> Tuple:
+        """
+        Date albums sort by date, then by the length of their name (longer name means more info), then by path.
+        Albums without a date sort by path (after all date albums).
+        """
+        album_date = self.album_date
+        if album_date is None:
+            return True, date.min, 0, self.relative_path
 
-            # Secondly, compare length (longer path means more info for date albums)
-            l1 = len(self.relative_path.name)
-            l2 = len(other.relative_path.name)
-            if l1 != l2:
-                return l1 < l2
+        return False, album_date, len(self.name), self.relative_path
 
-        # Fall back - compare the strings
-        return self.relative_path < other.relative_path
+    def __lt__(self, other):
+        assert isinstance(other, Album)
+        return self.sort_key < other.sort_key
 
     def __repr__(self) -> str:
         """
@@ -170,8 +182,10 @@ class Album(Node):
         return f"{qualifier}{self.__class__.__name__}(relative_path='{self.relative_path}')"
 
 
-@dataclass
+@dataclass(eq=False)  # Nodes are equal by path (Node.__eq__), not by comparing all fields
 class Folder(Node):
+    # In a freshly scanned tree, both dicts iterate sorted by name (the scanners add children in name order). Children
+    # added later (e.g. by the sync handlers) are appended at the end
     disk_info: protocols.DiskFolderInfoShape = field(default=None, repr=False)
     online_info: protocols.OnlineFolderInfoShape = field(default=None, repr=False)
 
@@ -182,6 +196,52 @@ class Folder(Node):
     def is_album(self) -> bool:
         return False
 
+    @cached_property
+    def content_hash(self) -> str | None:
+        """
+        A Merkle hash of everything under this folder (names, image counts and sync tokens of albums, and recursively,
+        the hashes of sub-folders). If a disk folder and an online folder have the same hash, they are in sync.
+        None if any album under the folder has an unknown sync state.
+
+        Computed once (after the scan) - it is not refreshed as the folder is modified.
+        """
+        lines: List[str] = []
+
+        for name, album in sorted(self.albums.items()):
+            if album.image_count == 0:
+                # Empty albums are never synced (so have no token) - the name and count is all that matters
+                lines.append(f"a:{name}:0")
+                continue
+
+            sync_token = album.sync_token
+            if sync_token is None:
+                return None
+
+            lines.append(f"a:{name}:{album.image_count}:{sync_token!r}")
+
+        for name, sub_folder in sorted(self.sub_folders.items()):
+            sub_folder_hash = sub_folder.content_hash
+            if sub_folder_hash is None:
+                return None
+
+            lines.append(f"f:{name}:{sub_folder_hash}")
+
+        return general_tools.content_hash(lines)
+
+    def add_sub_folder(self, sub_folder: 'Folder'):
+        """
+        Link a sub-folder to this folder. Children are always keyed by their name (lookups rely on that)
+        """
+        assert sub_folder.relative_path.parent == self.relative_path, f"{sub_folder} is not a child of {self}"
+        self.sub_folders[sub_folder.name] = sub_folder
+
+    def add_album(self, album: Album):
+        """
+        Link an album to this folder. Children are always keyed by their name (lookups rely on that)
+        """
+        assert album.relative_path.parent == self.relative_path, f"{album} is not a child of {self}"
+        self.albums[album.name] = album
+
     def __repr__(self) -> str:
         """
         Override the default repr to better represent the node
@@ -195,10 +255,11 @@ class Stats:
     # Add some statistics to the root source_folder
     folder_count: int = 0
     album_count: int = 0
+    empty_album_count: int = 0  # Included in album_count
     image_count: int = 0
 
 
-@dataclass
+@dataclass(eq=False)
 class RootFolder(Folder):
     relative_path: PurePath = PurePath()
     stats: Stats = field(default_factory=Stats)
@@ -20,6 +20,10 @@ class OnlineConnection:
     def __init__(self, core_connection: smugmug.SmugmugCoreConnection):
         self._conn = core_connection
 
+        # Bound the number of images downloaded at the same time (across all albums). The connection pool has room for
+        # these on top of the API requests
+        self._download_limiter = asyncio.Semaphore(smugmug.SmugmugCoreConnection.MAX_CONCURRENT_DOWNLOADS)
+
     @property
     def root_folder_uri(self) -> str:
         return self._conn.root_folder_uri
@@ -35,7 +39,14 @@ class OnlineConnection:
             self,
             album: protocols.OnlineAlbumInfoShape
     ) -> Generator[protocols.OnlineImageInfoShape, None, None]:
-        async for record in self._conn.paginate(relative_uri=album.images_uri, object_name="AlbumImage"):
+        async for record in self._conn.paginate(
+                relative_uri=album.images_uri,
+                object_name="AlbumImage",
+                params={
+                    "_filter": ",".join(smugmug.SmugmugImage.RECORD_FIELDS),
+                    "_filteruri": ",".join(smugmug.SmugmugImage.RECORD_URIS),
+                },
+        ):
             yield smugmug.SmugmugImage(record)
 
     async def iter_sub_folders(
@@ -110,13 +121,10 @@ class OnlineConnection:
             },
         )
 
-        # Wait for eventual consistency to settle before we look up the record again (the response returned a Node
-        # object - but we want the Folder object)
-        await asyncio.sleep(0.5)
-
-        # Lookup the album record
+        # Lookup the album record (the response returned a Node object - but we want the Album object). The record
+        # is eventually consistent, so it may take a moment to show up
         album_url = r["Node"]["Uris"]["Album"]["Uri"]
-        r = await self._conn.request_get(album_url)
+        r = await self._conn.request_get_when_available(album_url)
 
         # r = await self._conn.request_post(
         #     parent.online_info.albums_uri,
@@ -141,8 +149,13 @@ class OnlineConnection:
         if dry_run:
             return
 
-        # Download one by one! Concurrency will be handled on the event level
-        for image in images:
+        # Download the images concurrently (if one fails, the task group cancels the rest)
+        async with asyncio.TaskGroup() as task_group:
+            for image in images:
+                task_group.create_task(self._download_image(image=image, to_folder=to_folder))
+
+    async def _download_image(self, image: protocols.OnlineImageInfoShape, to_folder: Path):
+        async with self._download_limiter:
             await self._conn.request_download(
                 image_uri=await self._get_image_download_url(image),    # noqa
                 local_path=to_folder.joinpath(image.name),
@@ -173,14 +186,18 @@ class OnlineConnection:
         if dry_run:
             return
 
-        # Upload one by one! Concurrency will be handled on the event level
-        for image_path in image_paths:
-            await self._conn.request_upload(
-                image_path=image_path,
-                album_uri=to_album_uri,
-                image_name=image_path.name,
-                dry_run=dry_run
-            )
+        # Submit all uploads at once - the connection starts at most one per upload thread (and only then takes a rate
+        # limiter token). If one fails, the task group cancels the rest
+        async with asyncio.TaskGroup() as task_group:
+            for image_path in image_paths:
+                task_group.create_task(
+                    self._conn.request_upload(
+                        image_path=image_path,
+                        album_uri=to_album_uri,
+                        image_name=image_path.name,
+                        dry_run=dry_run
+                    )
+                )
 
     async def delete(self, uri: str, dry_run: bool) -> bool:
         if dry_run:
@@ -189,22 +206,51 @@ class OnlineConnection:
         await self._conn.request_delete(uri)
         return True
 
+    async def delete_images(
+            self,
+            album: protocols.OnlineAlbumInfoShape,
+            images: Iterable[protocols.OnlineImageInfoShape],
+            dry_run: bool
+    ) -> bool:
+        """
+        Delete images from an album in batches - a request per DELETE_IMAGES_BATCH_SIZE images (instead of a DELETE per
+        image, or one oversized request)
+
+        :param album: The album holding the images
+        :param images: Images to delete (must all belong to the album)
+        :param dry_run: If True, will not actually delete anything
+        """
+        image_uris = [image.uri for image in images]
+
+        if dry_run or not image_uris:
+            return False
+
+        batch_size = smugmug.SmugmugCoreConnection.DELETE_IMAGES_BATCH_SIZE
+        for start in range(0, len(image_uris), batch_size):
+            await self._conn.request_post(
+                f"{album.uri}!deleteimages",
+                json_data={"AlbumImageUris": ",".join(image_uris[start:start + batch_size])},
+            )
+
+        return True
+
 
 @asynccontextmanager
 async def connect(
-        connection_params: configuration.ConnectionParams
+        connection_params: configuration.ConnectionParams,
+        cache_dir: Path | None = None,
 ) -> Generator[OnlineConnection, None, None]:
-    """ Context manager for creating a smugmug connection """
-
-    core_connection = smugmug.SmugmugCoreConnection(connection_params)
-
-    await core_connection.connect()
+    """
+    Context manager for creating a smugmug connection
 
-    # Yield a high-level wrapper of the connection to expose only the methods we really need, without the details
-    # of the smugmug internals
-    yield OnlineConnection(core_connection)
+    :param cache_dir: If provided, the responses cache is kept there between runs
+    """
 
-    await core_connection.disconnect()
+    # The core connection is closed (and its connection pool released) even if the caller fails
+    async with smugmug.SmugmugCoreConnection(connection_params, cache_dir=cache_dir) as core_connection:
+        # Yield a high-level wrapper of the connection to expose only the methods we really need, without the details
+        # of the smugmug internals
+        yield OnlineConnection(core_connection)
 
 
 async def load_album_images(
@@ -239,19 +285,14 @@ async def download_missing_images(
         connection: OnlineConnection,
         dry_run: bool
 ) -> bool:
-    # Figure out which images to download
-    missing_images: List[models.Image] = []
-
     if from_online_album.requires_image_load:
         await load_album_images(album=from_online_album, connection=connection)
 
     if to_disk_album.requires_image_load:
         disk.load_album_images(album=to_disk_album)
 
-    disk_images_by_relative_path = {i.relative_path for i in to_disk_album.images}
-    for online_image in from_online_album.images:
-        if online_image.relative_path not in disk_images_by_relative_path:
-            missing_images.append(online_image)
+    # Figure out which images to download (off the event loop, this is pure CPU work on large albums)
+    missing_images = await asyncio.to_thread(find_missing_images, from_online_album.images, to_disk_album.images)
 
     if not missing_images:
         return False
@@ -265,7 +306,7 @@ async def download_missing_images(
     # Reload all images into disk album (to make sure it reflects the new situation on disk)
     disk.load_album_images(album=to_disk_album)
 
-    logger.info(f"Finished downloading {len(missing_images)} images from {from_online_album}")
+    logger.info("Finished downloading %d images from %s", len(missing_images), from_online_album)
     return True
 
 
@@ -275,13 +316,9 @@ async def upload_missing_images(
         connection: OnlineConnection,
         dry_run: bool
 ) -> bool:
-    # Figure out which images to upload
-    images_to_upload: List[pathlib.Path] = []
-
-    online_images_by_relative_path = {i.relative_path for i in (to_online_album.images or [])}
-    for disk_image in from_disk_album.images:
-        if disk_image.relative_path not in online_images_by_relative_path:
-            images_to_upload.append(disk_image.disk_info.disk_path)
+    # Figure out which images to upload (off the event loop, this is pure CPU work on large albums)
+    missing_images = await asyncio.to_thread(find_missing_images, from_disk_album.images, to_online_album.images or [])
+    images_to_upload: List[pathlib.Path] = [i.disk_info.disk_path for i in missing_images]
 
     if not images_to_upload:
         return False
@@ -294,5 +331,16 @@ async def upload_missing_images(
 
     await load_album_images(album=to_online_album, connection=connection)
 
-    logger.info(f"Finished uploading {len(images_to_upload)} images from {from_disk_album}")
+    logger.info("Finished uploading %d images from %s", len(images_to_upload), from_disk_album)
     return True
+
+
+def find_missing_images(
+        source_images: Iterable[models.Image],
+        target_images: Iterable[models.Image]
+) -> List[models.Image]:
+    """
+    Return the source images that do not exist (by relative path) in the target images
+    """
+    target_relative_paths = {i.relative_path for i in target_images}
+    return [i for i in source_images if i.relative_path not in target_relative_paths]
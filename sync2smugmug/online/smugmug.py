@@ -2,17 +2,26 @@ import asyncio
 import calendar
 import dataclasses
 import hashlib
+import json
 import logging
+import time
+from collections import OrderedDict
 from concurrent import futures
 from datetime import datetime
 from pathlib import Path
-from typing import List, Union, Dict, Generator, AsyncIterator, ClassVar
+from typing import List, Union, Dict, Generator, AsyncIterator, ClassVar, Tuple
 
 import aioretry
 from authlib.integrations import httpx_client, requests_client
 import httpx
 import requests
 
+try:
+    import orjson as json_parser
+except ImportError:
+    # orjson is optional (faster JSON decoding of large API responses)
+    import json as json_parser
+
 from sync2smugmug import configuration
 
 logger = logging.getLogger(__name__)
@@ -31,6 +40,72 @@ def retry_policy(info: aioretry.RetryInfo) -> aioretry.RetryPolicyStrategy:
     return True, 0
 
 
+class RateLimiter:
+    """
+    Token bucket pacing outgoing requests, so we slow down before the server starts throttling us (each throttled
+    request costs a back-off wait).
+
+    The rate adapts to the server: it is halved whenever we get throttled (429) and doubled back (up to the initial
+    rate) after a quiet period without throttling.
+    """
+
+    def __init__(self, rate: float, max_tokens: float, min_rate: float = 1.0, quiet_period: float = 30.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.max_tokens = max_tokens
+        self.min_rate = min_rate
+        self.quiet_period = quiet_period
+
+        self._tokens = max_tokens
+        self._refilled_at = time.monotonic()
+        self._throttled_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait_for_token(self):
+        # Waiters queue on the lock, so tokens are handed out in order
+        async with self._lock:
+            while True:
+                self._refill()
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                # Sleep until the next token is due (taking a server imposed back-off into account)
+                await asyncio.sleep(max(0.0, self._refilled_at - time.monotonic()) + (1 - self._tokens) / self.rate)
+
+    def throttled(self, retry_after: float | None = None):
+        """ Called when the server rejected a request for exceeding the rate limit """
+        now = time.monotonic()
+
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._throttled_at = now
+
+        # Drain the bucket (and if the server told us how long to back off, push the next refill to that time)
+        self._tokens = 0
+        self._refilled_at = now + (retry_after or 0)
+
+        logger.warning("Throttled by the server, slowing down to %.1f requests/sec", self.rate)
+
+    def update_from_headers(self, headers: httpx.Headers):
+        """ Never hand out more tokens than the server says we have left """
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is not None and remaining.isdigit():
+            self._tokens = min(self._tokens, float(remaining))
+
+    def _refill(self):
+        now = time.monotonic()
+
+        if self.rate < self.max_rate and now - self._throttled_at >= self.quiet_period:
+            # It has been quiet for a while, speed up again
+            self.rate = min(self.max_rate, self.rate * 2)
+            self._throttled_at = now
+
+        if now > self._refilled_at:
+            self._tokens = min(self.max_tokens, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+
+
 class SmugmugCoreConnection:
     """
     Connection class implementing the basic auth and transport protocols with Smugmug
@@ -40,8 +115,52 @@ class SmugmugCoreConnection:
     API_BASE_URL = f"{API_SERVER}/{API_PREFIX}"
     TIMEOUT = 10
 
-    def __init__(self, connection_params: configuration.ConnectionParams):
+    # Maximum number of API requests in flight at the same time (shared by all callers of this connection)
+    MAX_CONCURRENT_REQUESTS = 20
+
+    # Maximum number of concurrent image downloads (streams). These are not counted as API requests, so the connection
+    # pool is sized for both
+    MAX_CONCURRENT_DOWNLOADS = 8
+
+    # How long to keep idle (keep-alive) connections in the pool, so requests don't pay a new TLS handshake
+    KEEPALIVE_EXPIRY = 60
+
+    # Number of threads running the sync (posts / uploads) requests. The sync session keeps as many connections per
+    # host, so every thread can reuse a kept-alive connection
+    UPLOAD_THREADS = 16
+
+    # Initial (and maximum) pace of outgoing API requests. Adjusted down automatically when throttled
+    REQUESTS_PER_SECOND = 50
+    MAX_REQUESTS_BURST = 100
+
+    # How many times to retry a request that was throttled (429) by the server
+    MAX_THROTTLED_RETRIES = 3
+
+    # Number of items to ask for per page. If the server caps it lower, pagination follows the server's page size
+    PAGE_SIZE = 500
+
+    # Maximum number of images deleted with a single !deleteimages request (larger deletes are sent in batches)
+    DELETE_IMAGES_BATCH_SIZE = 100
+
+    # Maximum number of GET responses kept for conditional (If-None-Match) requests
+    RESPONSE_CACHE_SIZE = 4096
+
+    # The response cache is persisted between runs (so a rescan is mostly answered with 304s). Bump the version when
+    # the format of the cached responses changes, so old files are ignored
+    RESPONSE_CACHE_FILENAME = "smugmug_cache.json"
+    RESPONSE_CACHE_VERSION = 1
+
+    # Only responses holding these objects (the user, folders and album listings the scan requests) are persisted.
+    # Image listings (pages of up to PAGE_SIZE records, for every album) would make the file huge - they are kept in
+    # memory only
+    PERSISTED_RESPONSE_OBJECTS = ("User", "Folder", "Album")
+
+    # Back-off delays (seconds) used while waiting for a newly created record to become visible
+    EVENTUAL_CONSISTENCY_DELAYS = (0.05, 0.1, 0.2, 0.4, 0.8)
+
+    def __init__(self, connection_params: configuration.ConnectionParams, cache_dir: Path | None = None):
         self._connection_params = connection_params
+        self._response_cache_path = cache_dir.joinpath(self.RESPONSE_CACHE_FILENAME) if cache_dir else None
         self._user = None
         self._headers = {
             "Host": "www.smugmug.com",
@@ -57,6 +176,18 @@ class SmugmugCoreConnection:
 
         self._threadpool = None
 
+        # Bound the number of concurrent API calls (e.g. when fetching pages in parallel)
+        self._request_limiter = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        self._rate_limiter = RateLimiter(rate=self.REQUESTS_PER_SECOND, max_tokens=self.MAX_REQUESTS_BURST)
+
+        # One slot per upload thread. Uploads take a rate limiter token only once they hold a slot, so uploads still
+        # queued for a thread do not drain the bucket ahead of other API calls
+        self._upload_limiter = asyncio.Semaphore(self.UPLOAD_THREADS)
+
+        # LRU cache of GET responses by url (with their ETag). Used to issue conditional requests, so unchanged
+        # records (e.g. on a rescan) come back as an empty 304 and are served from here
+        self._response_cache: OrderedDict[str, Tuple[str, Dict]] = OrderedDict()
+
     @property
     def root_folder_uri(self) -> str:
         """
@@ -71,13 +202,29 @@ class SmugmugCoreConnection:
         """
         return uri == self._test_root_folder_uri
 
+    async def __aenter__(self) -> "SmugmugCoreConnection":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+
     async def connect(self):
-        # Create an async session (this is how we should work always)
+        # Reading (and later writing) the cache is blocking file I/O - keep it off the event loop
+        await asyncio.to_thread(self._load_response_cache)
+
+        # Create an async session (this is how we should work always). A single session (and connection pool) is
+        # used for the lifetime of the connection, so keep-alive connections are reused across all requests
         self._async_session = httpx_client.AsyncOAuth1Client(
             self._connection_params.consumer_key,
             self._connection_params.consumer_secret,
             token=self._connection_params.access_token,
             token_secret=self._connection_params.access_token_secret,
+            limits=httpx.Limits(
+                max_connections=self.MAX_CONCURRENT_REQUESTS + self.MAX_CONCURRENT_DOWNLOADS,
+                max_keepalive_connections=self.MAX_CONCURRENT_REQUESTS + self.MAX_CONCURRENT_DOWNLOADS,
+                keepalive_expiry=self.KEEPALIVE_EXPIRY,
+            ),
         )
 
         # Also create a sync client (because some of the Smugmug APIs do not work with the async client)
@@ -88,13 +235,19 @@ class SmugmugCoreConnection:
             token_secret=self._connection_params.access_token_secret,
         )
 
+        # The default adapter only keeps 10 connections per host, and the rest would be closed after each request
+        self._session.mount(
+            "https://",
+            requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=self.UPLOAD_THREADS),
+        )
+
         # Issue a request to get the user's JSON
         response = await self.request_get(f"user/{self._connection_params.account}")
         self._user = response["User"]
         self._root_folder_uri = self._user["Uris"]["Folder"]["Uri"]
         self._test_root_folder_uri = f"{self._root_folder_uri}/Test"
 
-        self._threadpool = futures.ThreadPoolExecutor(thread_name_prefix="uploader")
+        self._threadpool = futures.ThreadPoolExecutor(max_workers=self.UPLOAD_THREADS, thread_name_prefix="uploader")
 
     async def disconnect(self):
         if self._async_session is not None:
@@ -108,25 +261,129 @@ class SmugmugCoreConnection:
         if self._threadpool is not None:
             self._threadpool.shutdown(wait=True)
 
-    async def _request(self, method, url, *args, **kwargs) -> httpx.Response:
+        await asyncio.to_thread(self._save_response_cache)
+
+    def _load_response_cache(self):
+        if self._response_cache_path is None or not self._response_cache_path.exists():
+            return
+
+        try:
+            with self._response_cache_path.open() as f:
+                d = json.load(f)
+
+            # Only use a cache of the same format, and made for the same account
+            if d["version"] == self.RESPONSE_CACHE_VERSION and d["account"] == self._connection_params.account:
+                for cache_key, etag, response in d["responses"]:
+                    self._response_cache[cache_key] = (etag, response)
+
+        except Exception as e:  # noqa
+            # On any error reading the cache, just start with an empty one
+            logger.warning("Ignoring unreadable response cache %s (%s)", self._response_cache_path, e)
+            self._response_cache.clear()
+
+    def _save_response_cache(self):
+        if self._response_cache_path is None:
+            return
+
+        d = {
+            "version": self.RESPONSE_CACHE_VERSION,
+            "account": self._connection_params.account,
+            "responses": [
+                (cache_key, etag, response) for cache_key, (etag, response) in self._response_cache.items()
+                if any(object_name in response for object_name in self.PERSISTED_RESPONSE_OBJECTS)
+            ],
+        }
+
+        self._response_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._response_cache_path.open("w") as f:
+            json.dump(d, f)
+
+    async def _request(self, method, url, *args, expected_error_codes=(), **kwargs) -> httpx.Response:
         assert self._async_session is not None, "Call connect first!"
 
         try:
             if "headers" not in kwargs:
                 kwargs["headers"] = self._headers
 
-            r = await self._async_session.request(method, url, *args, **kwargs)
+            for attempt in range(self.MAX_THROTTLED_RETRIES + 1):
+                await self._rate_limiter.wait_for_token()
+
+                async with self._request_limiter:
+                    r = await self._async_session.request(method, url, *args, **kwargs)
+
+                self._rate_limiter.update_from_headers(r.headers)
+
+                if r.status_code != 429 or attempt == self.MAX_THROTTLED_RETRIES:
+                    break
+
+                # Throttled - slow down and try again
+                retry_after = r.headers.get("Retry-After", "")
+                self._rate_limiter.throttled(retry_after=float(retry_after) if retry_after.isdigit() else None)
+
             r.raise_for_status()
 
             return r
 
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in expected_error_codes:
+                logger.exception(f"Failed request: {method}, Url: {url}, args: {args}, kwargs: {kwargs}")
+            raise e
+
         except httpx.HTTPError as e:
             logger.exception(f"Failed request: {method}, Url: {url}, args: {args}, kwargs: {kwargs}")
             raise e
 
     async def request_get(self, relative_uri: str, *args, **kwargs) -> Dict:
-        r = await self._request("GET", self._format_url(relative_uri), *args, **kwargs)
-        return r.json()["Response"]
+        url = self._format_url(relative_uri)
+        cache_key = str(httpx.URL(url, params=kwargs.get("params")))
+
+        cached = self._response_cache.get(cache_key)
+        if cached is not None and "headers" not in kwargs:
+            kwargs["headers"] = {**self._headers, "If-None-Match": cached[0]}
+            kwargs["expected_error_codes"] = (*kwargs.get("expected_error_codes", ()), 304)
+
+        try:
+            r = await self._request("GET", url, *args, **kwargs)
+
+        except httpx.HTTPStatusError as e:
+            if cached is not None and e.response.status_code == 304:
+                # Not modified - serve from cache
+                self._response_cache.move_to_end(cache_key)
+                return cached[1]
+
+            raise e
+
+        response = json_parser.loads(r.content)["Response"]
+
+        etag = r.headers.get("ETag")
+        if etag:
+            self._response_cache[cache_key] = (etag, response)
+            self._response_cache.move_to_end(cache_key)
+
+            if len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+
+        return response
+
+    async def request_get_when_available(self, relative_uri: str) -> Dict:
+        """
+        Get a record that was just created.
+
+        Smugmug is eventually consistent, so a new record may not be visible right away. Rather than waiting a fixed
+        amount of time, poll with a short back-off and return as soon as the record materializes.
+        """
+        for delay in self.EVENTUAL_CONSISTENCY_DELAYS:
+            try:
+                return await self.request_get(relative_uri, expected_error_codes=(404,))
+
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404:
+                    raise e
+
+            await asyncio.sleep(delay)
+
+        # Last attempt (any error here is final)
+        return await self.request_get(relative_uri)
 
     async def request_post(self, relative_uri: str, json_data: Union[Dict, List], *args, **kwargs) -> Dict:
         """
@@ -146,11 +403,13 @@ class SmugmugCoreConnection:
             )
 
         try:
+            await self._rate_limiter.wait_for_token()
+
             # Run sync version in a threadpool instead!
             r = await asyncio.get_running_loop().run_in_executor(self._threadpool, sync_post)
             r.raise_for_status()
 
-            return r.json()["Response"]
+            return json_parser.loads(r.content)["Response"]
 
         except requests.HTTPError as e:
             logger.exception(f"Failed to post to {relative_uri} ({str(json_data)}) - {str(e)}")
@@ -163,6 +422,8 @@ class SmugmugCoreConnection:
     async def request_stream(self, absolute_uri: str) -> AsyncIterator[bytes]:
         assert self._async_session is not None, "Call connect first!"
 
+        await self._rate_limiter.wait_for_token()
+
         async with self._async_session.stream(method="GET", url=absolute_uri, timeout=self.TIMEOUT) as r:
             r.raise_for_status()
 
@@ -182,34 +443,38 @@ class SmugmugCoreConnection:
         if dry_run:
             return
 
-        # Sync function that will run in a thread pool
-        image_data: bytes = image_path.read_bytes()
-
-        headers = {
-            "X-Smug-AlbumUri": album_uri,
-            "X-Smug-Title": image_name,
-            "X-Smug-Caption": image_name,
-            # "X-Smug-Keywords": keywords,
-            "X-Smug-ResponseType": "JSON",
-            "X-Smug-Version": "v2",
-            "Content-MD5": hashlib.md5(image_data).hexdigest(),
-        }
+        # Sync function that will run in a thread pool. The file is read (and hashed) there too, so the event loop is
+        # not blocked, and uploads waiting for a thread do not hold their image in memory
+        def sync_post() -> httpx.Response:
+            image_data: bytes = image_path.read_bytes()
 
-        if image_to_replace_uri:
-            headers["X-Smug-ImageUri"] = image_to_replace_uri
+            headers = {
+                "X-Smug-AlbumUri": album_uri,
+                "X-Smug-Title": image_name,
+                "X-Smug-Caption": image_name,
+                # "X-Smug-Keywords": keywords,
+                "X-Smug-ResponseType": "JSON",
+                "X-Smug-Version": "v2",
+                "Content-MD5": hashlib.md5(image_data).hexdigest(),
+            }
+
+            if image_to_replace_uri:
+                headers["X-Smug-ImageUri"] = image_to_replace_uri
 
-        def sync_post() -> httpx.Response:
             return self._session.post(
                 "https://upload.smugmug.com/",
                 files={image_name: image_data},
                 headers=headers,
             )
 
-        # Run sync version in a threadpool instead (async version does not work)
-        r = await asyncio.get_running_loop().run_in_executor(
-            self._threadpool,
-            sync_post
-        )
+        async with self._upload_limiter:
+            await self._rate_limiter.wait_for_token()
+
+            # Run sync version in a threadpool instead (async version does not work)
+            r = await asyncio.get_running_loop().run_in_executor(
+                self._threadpool,
+                sync_post
+            )
 
         r.raise_for_status()
 
@@ -236,49 +501,79 @@ class SmugmugCoreConnection:
         """
         Download a single image from the Album on Smugmug to a source_folder on disk
         """
-        temp_file_name = local_path.with_suffix(".tmp")
+        # The temp file keeps the full name (not just the stem), so images downloaded at the same time that share a
+        # stem (e.g. IMG_1.jpg and IMG_1.mov of a live photo) do not write into the same file
+        temp_file_name = local_path.with_name(f"{local_path.name}.tmp")
+
+        try:
+            with open(temp_file_name, "wb") as f:
+                async for chunk in self.request_stream(f"{self.API_BASE_URL}{image_uri}"):
+                    f.write(chunk)
 
-        with open(temp_file_name, "wb") as f:
-            async for chunk in self.request_stream(f"{self.API_BASE_URL}{image_uri}"):
-                f.write(chunk)
+            # Now that we have completed writing the file to disk, we can use a rename operation to make that download
+            # 'atomic'. If the process failed mid-download, the scan will pick the image again for download.
+            local_path.unlink(missing_ok=True)
 
-        # Now that we have completed writing the file to disk, we can use a rename operation to make that download
-        # 'atomic'. If the process failed mid-download, the scan will pick the image again for download.
-        local_path.unlink(missing_ok=True)
+            temp_file_name.rename(local_path)
 
-        temp_file_name.rename(local_path)
+        except BaseException:
+            # Failed or cancelled (e.g. when another download in the same group failed) - don't leave the partial file
+            # behind in the album directory
+            temp_file_name.unlink(missing_ok=True)
+            raise
 
     async def paginate(
             self,
             relative_uri: str,
             object_name: str,
-            page_size: int = 100
+            page_size: int = PAGE_SIZE,
+            params: Dict | None = None,
     ) -> Generator[Dict, None, None]:
         """
-        Yield full list of items (through pagination)
+        Yield full list of items (through pagination). Additional query params (e.g. response filters) are sent with
+        every page request.
+
+        The first page tells us how many items there are in total, so all remaining pages are requested concurrently
+        (bounded by the connection's request limiter). Items are yielded in order, each page as soon as it arrives, so
+        the caller can start working while later pages are still in flight.
         """
 
         # Run the initial request
-        response = await self.request_get(relative_uri)
+        params = params or {}
+        response = await self.request_get(relative_uri, params={**params, "start": 1, "count": page_size})
 
         items = response.get(object_name) or []
         for item in items:
             yield item
 
-        # Now check if we need to get more pages, if so, iterate
+        # Now check if we need to get more pages
         paging = response.get("Pages") or {}
         total_count = paging.get("Total") or len(items)
         items_found = len(items)
 
-        while total_count > items_found:
-            response = await self.request_get(
-                relative_uri, params={"start": items_found + 1, "count": page_size}
+        if items_found == 0 or total_count <= items_found:
+            return
+
+        # Use the size of the first page as the stride (in case the server caps the page size we asked for)
+        pages = [
+            asyncio.create_task(
+                self.request_get(relative_uri, params={**params, "start": start, "count": items_found})
             )
+            for start in range(items_found + 1, total_count + 1, items_found)
+        ]
+
+        try:
+            for page in pages:
+                response = await page
+                for item in response.get(object_name) or []:
+                    yield item
 
-            items = response.get(object_name)
-            for item in items:
-                yield item
-                items_found += 1
+        finally:
+            # If the caller stopped early (or a page failed), don't leave requests running in the background
+            for page in pages:
+                page.cancel()
+
+            await asyncio.gather(*pages, return_exceptions=True)
 
 
 @dataclasses.dataclass
@@ -294,6 +589,13 @@ class SmugmugRecord:
 
 @dataclasses.dataclass
 class SmugmugImage(SmugmugRecord):
+    # Image records are large, and albums can have thousands of them. These are the only parts of the record we use,
+    # so listings ask Smugmug to send just these (keeps both the response and what we hold in memory small)
+    RECORD_FIELDS: ClassVar[Tuple[str, ...]] = (
+        "FileName", "Uri", "IsVideo", "OriginalSize", "ArchivedSize", "ArchivedUri", "Processing",
+    )
+    RECORD_URIS: ClassVar[Tuple[str, ...]] = ("LargestVideo",)
+
     size: int = dataclasses.field(init=False)
     is_video: bool = dataclasses.field(init=False)
 
@@ -21,7 +21,7 @@ class DeleteEmptyDirectories(DiskOptimization):
 
     def _scan(self, dir_path: Path, dry_run: bool) -> bool:
         if node_tools.dir_is_empty_of_pictures(dir_path):
-            logger.warning(f"Deleting empty dir {dir_path}")
+            logger.warning("Deleting empty dir %s", dir_path)
 
             if not dry_run:
                 shutil.rmtree(dir_path)
@@ -77,7 +77,9 @@ class DeleteImageDuplicates(DiskOptimization):
             sorted_duplicates = sorted_duplicates[1:]
 
             for date_album, image in sorted_duplicates:
-                logger.info(f"Deleting image {image.relative_path}. It's a duplicate of {image_to_keep.relative_path}")
+                logger.info(
+                    "Deleting image %s. It's a duplicate of %s", image.relative_path, image_to_keep.relative_path
+                )
 
                 # Actually delete (the newer image)
                 disk.delete_image_from_disk(image, dry_run=dry_run)
@@ -131,7 +133,7 @@ class DeleteAlbumDuplicates(DiskOptimization):
     def _move_photos(from_album: models.Album, to_album: models.Album, dry_run: bool):
         for image in from_album.images:
             if image.filename not in to_album.images:
-                logger.info(f"Moving image {image} to source_album {to_album}...")
+                logger.info("Moving image %s to source_album %s...", image, to_album)
 
                 if dry_run:
                     to_path = to_album.disk_info.disk_path
@@ -63,7 +63,7 @@ class ImportIPhoneImages(DiskOptimization):
                     root_folder=on_disk,
                     relative_path=parent_folder.relative_path.parent
                 )
-                parent_or_parent.sub_folders[parent_folder.relative_path.name] = parent_folder
+                parent_or_parent.add_sub_folder(parent_folder)
 
             album, was_created = \
                 find_or_create_album(
@@ -86,7 +86,7 @@ class ImportIPhoneImages(DiskOptimization):
                 self._cleanup_old_photo_export(dir_path=album.disk_info.disk_path, photo=photo, dry_run=dry_run)
 
             if album.disk_info.disk_path.joinpath(target_filename).exists():
-                logger.warning(f"Image ({target_filename}) already exists in source_album {album.relative_path}")
+                logger.warning("Image (%s) already exists in source_album %s", target_filename, album.relative_path)
 
                 last_import_date = max(last_import_date, photo.date)
                 continue
@@ -109,7 +109,7 @@ class ImportIPhoneImages(DiskOptimization):
             if export_result.exported:
                 last_import_date = max(last_import_date, photo.date)
 
-                logger.info(f"Imported iphone photo {photo.original_filename} as ({export_result.exported[0]})")
+                logger.info("Imported iphone photo %s as (%s)", photo.original_filename, export_result.exported[0])
                 requires_reload = True
 
         if not requires_reload:
@@ -130,7 +130,7 @@ class ImportIPhoneImages(DiskOptimization):
         file_name = PurePath(photo.original_filename)
         for path_to_check in dir_path.glob(f"{file_name.stem}*{file_name.suffix}"):
             if path_to_check.exists():
-                logger.info(f"Removing old export {path_to_check} (will export again later)")
+                logger.info("Removing old export %s (will export again later)", path_to_check)
                 if not dry_run:
                     path_to_check.unlink()
 
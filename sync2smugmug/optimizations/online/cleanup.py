@@ -20,7 +20,7 @@ class DeleteEmptyAlbums(OnlineOptimization):
         # Go over all albums and for each, check if there are duplicates
         for album in node_tools.iter_albums(root_folder=on_line):
             if album.online_info.image_count == 0:
-                logger.info(f"{self} - Deleting empty album {album}")
+                logger.info("%s - Deleting empty album %s", self, album)
                 changed |= await connection.delete(album.online_info.uri, dry_run=dry_run)
 
         return changed
@@ -22,7 +22,7 @@ class RemoveOnlineImageDuplicates(OnlineOptimization):
         # Go over all albums and for each, check if there are duplicates
         for album in node_tools.iter_albums(root_folder=on_line):
             if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"Analyzing {album} for duplicates")
+                logger.debug("Analyzing %s for duplicates", album)
 
             await online.load_album_images(album=album, connection=connection)
 
@@ -37,11 +37,19 @@ class RemoveOnlineImageDuplicates(OnlineOptimization):
                 already_found.add(image.filename)
 
             if duplicates:
-                logger.info(f"{self} - Deleting {len(duplicates)} duplicate photos")
-
-                for duplicate_image in duplicates:
-                    # This is a duplicate!
-                    logger.info(f"Deleting image {duplicate_image}")
-                    changed |= await connection.delete(duplicate_image.online_info.uri, dry_run=dry_run)
+                logger.info("%s - Deleting %d duplicate photos from %s", self, len(duplicates), album)
+
+                # Delete all duplicates in one go (a single round-trip instead of one per image)
+                changed |= await connection.delete_images(
+                    album=album.online_info,
+                    images=[duplicate_image.online_info for duplicate_image in duplicates],
+                    dry_run=dry_run,
+                )
+
+                if not dry_run:
+                    # Reflect the deletion in the album (duplicates are identified by object, not by name)
+                    duplicate_ids = {id(duplicate_image) for duplicate_image in duplicates}
+                    album.images = [image for image in album.images if id(image) not in duplicate_ids]
+                    album.image_count = len(album.images)
 
         return changed
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Protocol, Dict
+from typing import Protocol, Dict, Tuple
 
 
 class DiskInfoShape(Protocol):
@@ -27,15 +27,30 @@ class DiskAlbumInfoShape(Protocol):
     def disk_time(self) -> float | None:
         raise NotImplementedError
 
+    @property
+    def content_hash(self) -> str | None:
+        raise NotImplementedError
+
     @property
     def last_updated(self) -> float:
         raise NotImplementedError
 
-    def remember_sync(self, online_time: float | None):
+    @property
+    def synced_online_time(self) -> float | None:
+        raise NotImplementedError
+
+    def unchanged_since_sync(self) -> Tuple[bool, str | None]:
+        raise NotImplementedError
+
+    def current_content_hash(self) -> str:
+        raise NotImplementedError
+
+    def remember_sync(self, online_time: float | None, content_hash: str | None = None):
         """
         Persists current sync times to disk.
 
         Sync time will be taken as now(). Disk time will be taken as last update from disk and online time is provided.
+        The content hash is computed from the disk, unless provided.
 
         If online_time is None - this will reset the sync data (sync_data property will return None)
         """
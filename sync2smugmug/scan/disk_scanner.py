@@ -1,6 +1,9 @@
+import asyncio
 import logging
+import os
+from operator import attrgetter
 from pathlib import Path, PurePath
-from typing import Generator, Dict
+from typing import Generator, Dict, Tuple, List
 
 from sync2smugmug import models, disk
 from sync2smugmug.utils import image_tools, general_tools
@@ -17,6 +20,12 @@ async def scan(base_dir: Path) -> models.RootFolder:
     """
     logger.info(f"Scanning disk (starting from {base_dir})...")
 
+    # Scanning the disk is blocking I/O - run it in a thread so the event loop is free to do other work (e.g. scan
+    # Smugmug at the same time)
+    return await asyncio.to_thread(_scan, base_dir)
+
+
+def _scan(base_dir: Path) -> models.RootFolder:
     root = models.RootFolder(disk_info=disk.DiskFolderInfo(disk_path=base_dir)) # noqa
 
     # Keep a lookup table to be able to get the node (by path) for quick access during the os.walk
@@ -24,8 +33,7 @@ async def scan(base_dir: Path) -> models.RootFolder:
     folders: Dict[PurePath, models.Folder] = dict()
     folders[root.relative_path] = root
 
-    for dir_path in iter_directories(base_dir):
-        dir_relative_path = PurePath(dir_path.relative_to(base_dir))
+    for dir_path, dir_relative_path in iter_directories(base_dir):
         parent_relative_path = dir_relative_path.parent
 
         parent_folder = folders.get(parent_relative_path)
@@ -37,7 +45,9 @@ async def scan(base_dir: Path) -> models.RootFolder:
         assert dir_relative_path is not None and parent_relative_path is not None and parent_folder
 
         # Figure out if this is an Album of a Folder
-        if has_images(dir_path):  # A source_album has images
+        dir_has_images, dir_has_sub_folders = classify_directory(dir_path)
+
+        if dir_has_images:  # A source_album has images
             album = models.Album(
                 relative_path=dir_relative_path,
                 disk_info=disk.DiskAlbumInfo(disk_path=dir_path),   # noqa
@@ -45,69 +55,94 @@ async def scan(base_dir: Path) -> models.RootFolder:
 
             disk.load_album_images(album=album)
 
-            parent_folder.albums[album.name] = album
+            parent_folder.add_album(album)
 
             root.stats.album_count += 1
             root.stats.image_count += album.image_count
 
-        elif has_sub_folders(dir_path):  # A source_folder has sub-folders
+        elif dir_has_sub_folders:  # A source_folder has sub-folders
             folder = models.Folder(
                 relative_path=dir_relative_path,
                 disk_info=disk.DiskFolderInfo(disk_path=dir_path)   # noqa
             )
-            parent_folder.sub_folders[folder.name] = folder
+            parent_folder.add_sub_folder(folder)
 
             root.stats.folder_count += 1
             folders[dir_relative_path] = folder
 
         else:
             # Skip empty dirs
-            logger.info(f"Empty directory {dir_path}")
+            logger.info("Empty directory %s", dir_path)
 
             continue
 
     return root
 
 
-def _should_skip(entry: Path) -> bool:
+def _should_skip(entry: os.DirEntry) -> bool:
     """
     Figures out which folders should be skipped (special folders that are not meant for upload)
 
     :param entry: The entry
     """
 
-    if not entry.is_dir() or entry.stem.startswith("."):
+    if not entry.is_dir() or entry.name.startswith("."):
         return True
 
-    if "Picasa" in entry.parts:
+    if entry.name == "Picasa":
         return True
 
-    basename = entry.stem.lower()
+    basename = os.path.splitext(entry.name)[0].lower()
 
-    if any(a == basename for a in ("originals", "lightroom", "developed")):
+    if basename in ("originals", "lightroom", "developed"):
         return True
 
     return False
 
 
-def iter_directories(root_dir: Path) -> Generator[Path, None, None]:
+def iter_directories(root_dir: Path) -> Generator[Tuple[Path, PurePath], None, None]:
     """
-    Recursively yield Path objects for given directory (DFS).
+    Yield Path objects for given directory (DFS, parents before children), along with their path relative to the
+    root. Uses an explicit stack rather than recursion, and closes each directory listing as soon as it was read.
+    Sibling directories are yielded in name order (so the scanned tree's children are already sorted).
     """
-    for entry in root_dir.iterdir():
-        if _should_skip(entry):
-            continue
+    if "Picasa" in root_dir.parts:
+        return
+
+    # Directories to visit: (path, relative path)
+    stack: List[Tuple[Path, PurePath]] = [(root_dir, PurePath())]
 
-        # Yield entry first
-        yield entry
+    while stack:
+        dir_path, relative_dir = stack.pop()
 
-        # Now yield children
-        yield from iter_directories(entry)  # see below for Python 2.x
+        if relative_dir != PurePath():
+            yield dir_path, relative_dir
 
+        with os.scandir(dir_path) as it:
+            children = [
+                (Path(entry.path), relative_dir / entry.name)
+                for entry in sorted(it, key=attrgetter("name"))
+                if not _should_skip(entry)
+            ]
+
+        # Pushed in reverse order, so they are visited in name order
+        stack.extend(reversed(children))
+
+
+def classify_directory(dir_path: Path) -> Tuple[bool, bool]:
+    """
+    Check (in a single pass over the directory) if it has images and if it has sub-folders. Stops as soon as an image
+    is found, as that is enough to make the directory an album.
+    """
+    has_sub_folders = False
 
-def has_images(dir_path: Path) -> bool:
-    return any(image_tools.is_image(PurePath(e.name)) for e in dir_path.iterdir() if e.is_file())
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            if entry.is_file():
+                if image_tools.is_image(PurePath(entry.name)):
+                    return True, has_sub_folders
 
+            elif entry.is_dir():
+                has_sub_folders = True
 
-def has_sub_folders(dir_path: Path) -> bool:
-    return any(e.is_dir() for e in dir_path.iterdir())
+    return False, has_sub_folders
@@ -1,4 +1,7 @@
+import asyncio
 import logging
+from operator import attrgetter
+from typing import List, AsyncIterator, TypeVar
 
 from sync2smugmug import models
 from sync2smugmug.online import online
@@ -6,11 +9,20 @@ from sync2smugmug.utils import general_tools
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Number of workers listing folders at the same time (wide trees would otherwise flood the API)
+SCAN_WORKERS = 64
+
 
 @general_tools.timeit
-async def scan(connection: online.OnlineConnection) -> models.RootFolder:
+async def scan(connection: online.OnlineConnection, depth_first: bool = False) -> models.RootFolder:
     """
     Discover hierarchy of folders and albums on Smugmug
+
+    :param connection: The connection to Smugmug
+    :param depth_first: If True, scan the deepest pending folders first (fewer folders pending at any time on wide
+        trees). Otherwise, scan level by level.
     :return: A root source_folder object populated with the entire smugmug hierarchy
     """
 
@@ -20,27 +32,78 @@ async def scan(connection: online.OnlineConnection) -> models.RootFolder:
     root = models.RootFolder()
     root.online_info = await connection.get_folder(folder_relative_uri=connection.root_folder_uri)
 
-    # Start the recursive scan from the root
-    await _scan_recursive(
-        root_folder=root,
-        folder=root,
-        connection=connection,
-    )
+    # A fixed pool of workers takes folders off the queue, and queues the sub-folders they discover. This bounds
+    # concurrency regardless of how wide the tree is. A LIFO queue turns the level by level scan into a depth first one.
+    queue: asyncio.Queue[models.Folder] = asyncio.LifoQueue() if depth_first else asyncio.Queue()
+    queue.put_nowait(root)
+
+    # Every folder scanned (used to compute the statistics in one pass at the end)
+    scanned_folders: List[models.Folder] = []
+
+    # If any worker fails, the task group cancels the other workers (and the wait below) and raises the error
+    async with asyncio.TaskGroup() as task_group:
+        workers = [
+            task_group.create_task(_scan_worker(queue=queue, connection=connection, scanned_folders=scanned_folders))
+            for _ in range(SCAN_WORKERS)
+        ]
+
+        await queue.join()
+
+        # All folders were scanned - stop the workers (they would otherwise wait for more work forever)
+        for worker in workers:
+            worker.cancel()
+
+    _update_stats(root_folder=root, folders=scanned_folders)
 
     return root
 
 
-async def _scan_recursive(
-        root_folder: models.RootFolder,
-        folder: models.Folder,
+async def _scan_worker(
+        queue: asyncio.Queue[models.Folder],
         connection: online.OnlineConnection,
+        scanned_folders: List[models.Folder],
 ):
     """
-    Recursively scan folders called to dig into Smugmug
+    Take folders off the queue, scan them and queue their sub-folders (runs until cancelled)
+    """
+    # Check the log level once, not per folder
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+    while True:
+        folder = await queue.get()
+
+        try:
+            for sub_folder in await _scan_folder(folder=folder, connection=connection):
+                queue.put_nowait(sub_folder)
+
+            scanned_folders.append(folder)
+
+            if debug_enabled:
+                logger.debug("%s - scanned (%d albums)", folder, len(folder.albums))
+
+        finally:
+            queue.task_done()
+
+
+async def _scan_folder(
+        folder: models.Folder,
+        connection: online.OnlineConnection,
+) -> List[models.Folder]:
+    """
+    Scan a single folder (albums and sub-folders) on Smugmug
+    :return: The sub-folders found (still to be scanned)
     """
+    sub_folders: List[models.Folder] = []
+
+    # Albums and sub-folders are independent listings - fetch both at the same time
+    album_records, sub_folder_records = await asyncio.gather(
+        _collect(connection.iter_albums(folder.online_info)),
+        _collect(connection.iter_sub_folders(folder.online_info)),
+    )
 
-    # Pick up the source_folder's albums (these are leaves in the tree - and do not have children)
-    async for album_record in connection.iter_albums(folder.online_info):
+    # Pick up the source_folder's albums (these are leaves in the tree - and do not have children). Children are added
+    # in name order, so the sync can walk them as they are
+    for album_record in sorted(album_records, key=attrgetter("name")):
         album_name = album_record.name
         album_relative_path = folder.relative_path.joinpath(album_name)
 
@@ -51,14 +114,10 @@ async def _scan_recursive(
         )
 
         # Associate the source_album with our source_folder
-        folder.albums[album_name] = album
+        folder.add_album(album)
 
-        # Update target_parent counts
-        root_folder.stats.album_count += 1
-        root_folder.stats.image_count += album.image_count
-
-    # Recursively scan source_folder's children (either sub-folders or albums)
-    async for sub_folder_record in connection.iter_sub_folders(folder.online_info):
+    # Pick up source_folder's children (sub-folders)
+    for sub_folder_record in sorted(sub_folder_records, key=attrgetter("name")):
         sub_folder_name = sub_folder_record.name
 
         sub_folder = models.Folder(
@@ -70,17 +129,24 @@ async def _scan_recursive(
             # Skip over the test source_folder (this will be only scratch, visible only to me)
             continue
 
-        folder.sub_folders[sub_folder_name] = sub_folder
-        root_folder.stats.folder_count += 1
+        folder.add_sub_folder(sub_folder)
+        sub_folders.append(sub_folder)
 
-        # Recursively call on this source_folder to discover the subtree
-        await _scan_recursive(
-            root_folder=root_folder,
-            folder=sub_folder,
-            connection=connection,
-        )
+    return sub_folders
+
+
+def _update_stats(root_folder: models.RootFolder, folders: List[models.Folder]):
+    """
+    Compute the root's statistics in a single pass over all folders (the root included)
+    """
+    albums = [album for folder in folders for album in folder.albums.values()]
+
+    root_folder.stats.folder_count = len(folders) - 1
+    root_folder.stats.album_count = len(albums)
+    root_folder.stats.empty_album_count = sum(1 for album in albums if album.image_count == 0)
+    root_folder.stats.image_count = sum(album.image_count for album in albums)
 
-    if logger.isEnabledFor(logging.DEBUG):
-        logger.debug(f"{folder} - scanned ({len(folder.albums)} albums)")
 
-    return folder
+async def _collect(records: AsyncIterator[T]) -> List[T]:
+    """ Drain an async iterator into a list (so it can be awaited alongside other listings) """
+    return [record async for record in records]
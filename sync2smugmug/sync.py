@@ -1,14 +1,22 @@
+import asyncio
 import logging
-from typing import Type, Tuple
+from operator import attrgetter
+from typing import Type, Tuple, List, Awaitable, TypeVar
 
 from sync2smugmug import models, policy, events, event_manager, disk
 from sync2smugmug.configuration import config
-from sync2smugmug.online import online
+from sync2smugmug.online import online, smugmug
 from sync2smugmug.utils import image_tools
 
 logger = logging.getLogger(__name__)
 
-DELTA = 360.0  # 360 seconds to allow between online and disk clocks
+DELTA = disk.SYNC_TIME_DELTA  # 360 seconds to allow between online and disk clocks
+
+# How many albums (of the same folder) may be compared at the same time. Comparisons are mostly waiting on Smugmug, so
+# this is sized at twice the number of concurrent requests the connection allows
+MAX_CONCURRENT_ALBUM_SYNCS = 2 * smugmug.SmugmugCoreConnection.MAX_CONCURRENT_REQUESTS
+
+T = TypeVar("T")
 
 
 async def synchronize(
@@ -59,98 +67,123 @@ async def synchronize_folders(
         dry_run: bool,
 ):
     """
-    Recursively sync the directory structure from source_folder (and children) into target_folder (and children).
+    Sync the directory structure from source_folder (and children) into target_folder (and children).
     The event group will determine what how each event is being handled (either Upload or Download).
+
+    Folders are visited depth-first (in name order) using an explicit stack rather than recursion, so deep
+    hierarchies don't pay a call frame per folder (or risk hitting the recursion limit).
     """
 
     assert source_folder is not None, "source_folder must always be there!"
 
-    # Wait first for all other tasks to finish before we start this one. This will allow the synchronization to be
-    # more orderly and show progress in a more meaningful way
-    await event_manager.join()
+    album_sync_limiter = asyncio.Semaphore(MAX_CONCURRENT_ALBUM_SYNCS)
 
-    logger.info(f"Synchronizing {source_folder.relative_path}")
+    # Check the log level once for the whole run, not per folder / album
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
 
-    # If target_folder is missing - we need to add it whole
-    if target_folder is None:
-        assert target_folder_parent is not None, 'target_folder_parent should always be there!'
+    # Folders still to visit: (source_folder, target_folder, target_folder_parent)
+    stack: List[Tuple[models.Folder, models.Folder | None, models.Folder | None]] = [
+        (source_folder, target_folder, target_folder_parent)
+    ]
 
-        logger.info(f"[++] {source_folder}")
+    while stack:
+        source_folder, target_folder, target_folder_parent = stack.pop()
 
-        event_data = events.FolderEventData(
-            source_folder=source_folder,
-            target_parent=target_folder_parent,
-            message=f"entire folder {source_folder}",
-            connection=connection,
-        )
+        # Wait first for all other tasks to finish before we start this one. This will allow the synchronization to
+        # be more orderly and show progress in a more meaningful way
+        await event_manager.join()
 
-        await event_manager.fire_event(event=event_group.FOLDER_ADD, event_data=event_data, dry_run=dry_run)
+        logger.info("Synchronizing %s", source_folder.relative_path)
+
+        # If target_folder is missing - we need to add it whole
+        if target_folder is None:
+            assert target_folder_parent is not None, 'target_folder_parent should always be there!'
+
+            logger.info("[++] %s", source_folder)
+
+            event_data = events.FolderEventData(
+                source_folder=source_folder,
+                target_parent=target_folder_parent,
+                message=f"entire folder {source_folder}",
+                connection=connection,
+            )
+
+            await event_manager.fire_event(event=event_group.FOLDER_ADD, event_data=event_data, dry_run=dry_run)
+            continue
 
-    else:
         # Both folders exist (and have same relative path)
         assert source_folder.relative_path == target_folder.relative_path
 
-        # First process albums
-        sorted_album_names = sorted(source_folder.albums.keys())
-        for album_name in sorted_album_names:
-            source_album = source_folder.albums[album_name]
-            to_album = target_folder.albums.get(album_name)
-
-            if source_album.image_count > 0:
-                await synchronize_albums(
-                    source_album=source_album,
-                    target_album=to_album,
-                    target_folder_parent=target_folder,
-                    event_group=event_group,
-                    sync_action=sync_action,
+        # If the whole tree under the folder is known to be in sync, there is nothing to do here (or below)
+        if not config.force_refresh and \
+                source_folder.content_hash is not None and source_folder.content_hash == target_folder.content_hash:
+            if debug_enabled:
+                logger.debug("[==] %s (entire folder)", source_folder.relative_path)
+
+            continue
+
+        # First process albums (compared concurrently, as each comparison is mostly waiting on Smugmug - in a task
+        # group, so if one fails the rest are cancelled). The source tree is only read here (the handlers modify the
+        # target tree), so its children are still in name order as scanned
+        async with asyncio.TaskGroup() as tg:
+            for album_name, source_album in source_folder.albums.items():
+                to_album = target_folder.albums.get(album_name)
+
+                if source_album.image_count > 0:
+                    tg.create_task(
+                        _limited(
+                            album_sync_limiter,
+                            synchronize_albums(
+                                source_album=source_album,
+                                target_album=to_album,
+                                target_folder_parent=target_folder,
+                                event_group=event_group,
+                                sync_action=sync_action,
+                                connection=connection,
+                                dry_run=dry_run,
+                                debug_enabled=debug_enabled,
+                            ),
+                        )
+                    )
+
+        # Now, queue the sub folders (pushed in reverse order, so they are visited in name order)
+        for sub_folder_name, sub_folder in reversed(source_folder.sub_folders.items()):
+            stack.append((
+                sub_folder,
+                target_folder.sub_folders.get(sub_folder_name),
+                target_folder,
+            ))
+
+        if event_group.delete_permitted(sync_action):
+            # If delete is required, delete all children of 'target_folder' that do not exist in 'source_folder'.
+            # The names to delete are computed up front as a set difference (which is also a copy, so the deletes
+            # can safely modify the folder while we iterate)
+            sub_folder_names_to_delete = target_folder.sub_folders.keys() - source_folder.sub_folders.keys()
+            for sub_folder_name in sorted(sub_folder_names_to_delete):
+                await handle_delete(
+                    event=event_group.FOLDER_DELETE,
+                    event_data_class=events.DeleteFolderEventData,
+                    node_to_delete=target_folder.sub_folders[sub_folder_name],
+                    parent_folder=target_folder,
                     connection=connection,
                     dry_run=dry_run,
                 )
 
-        # Now, recursively process sub folders
-        sorted_folder_names = sorted(source_folder.sub_folders.keys())
-        for sub_folder_name in sorted_folder_names:
-            source_sub_folder = source_folder.sub_folders[sub_folder_name]
-            target_sub_folder = target_folder.sub_folders.get(sub_folder_name)
-
-            await synchronize_folders(
-                source_folder=source_sub_folder,
-                target_folder=target_sub_folder,
-                target_folder_parent=target_folder,
-                event_group=event_group,
-                sync_action=sync_action,
-                connection=connection,
-                dry_run=dry_run,
-            )
+            album_names_to_delete = target_folder.albums.keys() - source_folder.albums.keys()
+            for album_name in sorted(album_names_to_delete):
+                await handle_delete(
+                    event=event_group.ALBUM_DELETE,
+                    event_data_class=events.DeleteAlbumEventData,
+                    node_to_delete=target_folder.albums[album_name],
+                    parent_folder=target_folder,
+                    connection=connection,
+                    dry_run=dry_run,
+                )
 
-        if event_group.delete_permitted(sync_action):
-            # If delete is required, delete all children of 'target_folder' that do not exist in 'source_folder'
-
-            # Make a local copy of the source_album list (so we don't modify during iteration)
-            target_sub_folders = dict(target_folder.sub_folders)
-            for sub_folder_name, sub_folder in target_sub_folders.items():
-                if sub_folder_name not in source_folder.sub_folders:
-                    await handle_delete(
-                        event=event_group.FOLDER_DELETE,
-                        event_data_class=events.DeleteFolderEventData,
-                        node_to_delete=sub_folder,
-                        parent_folder=target_folder,
-                        connection=connection,
-                        dry_run=dry_run,
-                    )
 
-            # Make a local copy of the source_album list (so we don't modify during iteration)
-            target_albums = dict(target_folder.albums)
-            for album_name, album in target_albums.items():
-                if album_name not in source_folder.albums:
-                    await handle_delete(
-                        event=event_group.ALBUM_DELETE,
-                        event_data_class=events.DeleteAlbumEventData,
-                        node_to_delete=album,
-                        parent_folder=target_folder,
-                        connection=connection,
-                        dry_run=dry_run,
-                    )
+async def _limited(limiter: asyncio.Semaphore, awaitable: Awaitable[T]) -> T:
+    async with limiter:
+        return await awaitable
 
 
 async def synchronize_albums(
@@ -161,6 +194,7 @@ async def synchronize_albums(
         sync_action: policy.SyncAction,
         connection: online.OnlineConnection,
         dry_run: bool,
+        debug_enabled: bool = False,
 ):
     """
     Given both disk and online version of the album exist, we need to go down to the level of images.
@@ -168,7 +202,7 @@ async def synchronize_albums(
     assert source_album is not None
 
     if target_album is None:
-        logger.info(f"[++] {source_album}")
+        logger.info("[++] %s", source_album)
 
         # Add a brand-new album
         event_data = events.AlbumEventData(
@@ -193,7 +227,8 @@ async def synchronize_albums(
     content_is_the_same, it_was_quick = await compare_disk_and_online_albums(
         disk_album=disk_album,
         online_album=online_album,
-        connection=connection
+        connection=connection,
+        dry_run=dry_run,
     )
 
     if not content_is_the_same:
@@ -207,7 +242,7 @@ async def synchronize_albums(
             disk.load_album_images(album=disk_album)
 
         # Now add a sync actions to synchronize the albums
-        logger.info(f"[<>] {disk_album} != {online_album}")
+        logger.info("[<>] %s != %s", disk_album, online_album)
 
         event_data = events.SyncAlbumImagesEventData(
             disk_album=disk_album,
@@ -220,8 +255,8 @@ async def synchronize_albums(
         await event_manager.fire_event(event=event_group.ALBUM_SYNC, event_data=event_data, dry_run=dry_run)
 
     else:
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"[==] {source_album.relative_path}")
+        if debug_enabled:
+            logger.debug("[==] %s", source_album.relative_path)
 
     if disk_album.disk_info.disk_time is None or not it_was_quick:
         # Special case #1: If we don't have sync data yet, make it now
@@ -237,7 +272,7 @@ async def handle_delete(
         connection: online.OnlineConnection,
         dry_run: bool,
 ):
-    logger.info(f"[--] {node_to_delete}")
+    logger.info("[--] %s", node_to_delete)
 
     # Intentionally limit concurrency here...
     event_data = event_data_class(  # noqa PyCharm does not properly recognize dataclass constructors
@@ -258,6 +293,7 @@ async def compare_disk_and_online_albums(
         disk_album: models.Album,
         online_album: models.Album,
         connection: online.OnlineConnection,
+        dry_run: bool,
 ) -> Tuple[bool, bool]:
     """
     Perform a smart comparison between an online album and a disk album. This will take into account the last sync
@@ -272,7 +308,7 @@ async def compare_disk_and_online_albums(
     assert disk_album.is_on_disk and online_album.is_online
 
     # Use sync_data to see if we can shortcut the entire comparison
-    if albums_already_synced(disk_album, online_album):
+    if albums_already_synced(disk_album, online_album, dry_run=dry_run):
         return True, True
 
     if disk_album.relative_path != online_album.relative_path:
@@ -281,7 +317,7 @@ async def compare_disk_and_online_albums(
     if disk_album.image_count != online_album.image_count:
         return False, True
 
-    logger.info(f"[^^] Loading images for comparison {online_album}")
+    logger.info("[^^] Loading images for comparison %s", online_album)
 
     # Compare images - one by one
     if online_album.requires_image_load:
@@ -290,8 +326,9 @@ async def compare_disk_and_online_albums(
     if disk_album.requires_image_load:
         disk.load_album_images(disk_album)
 
-    disk_images = sorted(disk_album.images, key=lambda k: k.relative_path)
-    online_images = sorted(online_album.images, key=lambda k: k.relative_path)
+    # Both albums have the same path, so sorting by file name is sorting by path (without building a path per image)
+    disk_images = sorted(disk_album.images, key=attrgetter("filename.name"))
+    online_images = sorted(online_album.images, key=attrgetter("filename.name"))
 
     for disk_image, online_image in zip(disk_images, online_images):
         if not image_tools.images_are_the_same(disk_image, online_image):
@@ -301,7 +338,7 @@ async def compare_disk_and_online_albums(
     return True, False
 
 
-def albums_already_synced(disk_album: models.Album, online_album: models.Album) -> bool:
+def albums_already_synced(disk_album: models.Album, online_album: models.Album, dry_run: bool) -> bool:
     disk_info = disk_album.disk_info
     online_info = online_album.online_info
 
@@ -320,17 +357,19 @@ def albums_already_synced(disk_album: models.Album, online_album: models.Album)
         return False
 
     if abs(disk_info.disk_time - disk_info.last_updated) > DELTA:
-        # Disk last update is different (disk changed)
-        return True
-
-    return True
+        # Disk last update is different (disk changed). If we remember what the album held at the last sync, compare
+        # against that (cheap, local) instead of going image by image against Smugmug
+        if disk_info.content_hash is not None:
+            unchanged, current_content_hash = disk_info.unchanged_since_sync()
+            if unchanged and current_content_hash is not None and not dry_run:
+                # Record the new disk time, so the content does not need to be checked again next time
+                disk_info.remember_sync(disk_info.online_time, content_hash=current_content_hash)
 
+            return unchanged
 
-async def load_images_for_online_album(online_album: models.Album, connection: online.OnlineConnection):
-    if not online_album.requires_image_load:
-        return
+        return True
 
-    await online.load_album_images(album=online_album, connection=connection)
+    return True
 
 
 def print_summary(on_disk: models.RootFolder, on_smugmug: models.RootFolder):
@@ -350,7 +389,7 @@ def print_summary(on_disk: models.RootFolder, on_smugmug: models.RootFolder):
 
     print(f"  {'Total': <21}:               : {em.total_processed} / {em.total_submitted}")
 
-    for action_type, count in em.event_count_by_type.items():
+    for action_type, count in em.event_count_by_type.most_common():
         print(f"  {action_type: <21}:               : {count}")
 
     print("")
@@ -1,29 +1,52 @@
 import asyncio
+import functools
+import hashlib
 import logging
 import time
+from typing import Iterable
 
 logger = logging.getLogger(__name__)
 
 
 def timeit(func):
     """
-    Timeit function that works for both regular functions and async coroutines
+    Timeit function that works for both regular functions and async coroutines (the kind of wrapper is decided once,
+    when decorating)
     """
 
-    async def process(f, *args, **params):
-        if asyncio.iscoroutinefunction(func):
-            return await f(*args, **params)
-        else:
-            return f(*args, **params)
+    def log_elapsed(elapsed: float):
+        if elapsed > 1 and logger.isEnabledFor(logging.INFO):
+            logger.info("!---- '%s.%s' execution time: %.2f sec ----!", func.__module__, func.__name__, elapsed)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_helper(*args, **params):
+            start = time.perf_counter()
+            result = await func(*args, **params)
+            log_elapsed(time.perf_counter() - start)
+            return result
+
+        return async_helper
+
+    @functools.wraps(func)
+    def helper(*args, **params):
+        start = time.perf_counter()
+        result = func(*args, **params)
+        log_elapsed(time.perf_counter() - start)
+        return result
 
-    async def helper(*args, **params):
-        start = time.time()
-        result = await process(func, *args, **params)
+    return helper
 
-        elapsed = time.time() - start
-        if elapsed > 1:
-            logger.info(f"!---- '{func.__module__}.{func.__name__}' execution time: {elapsed:.2f} sec ----!")
 
-        return result
+def content_hash(lines: Iterable[str]) -> str:
+    """
+    A short fingerprint of a sequence of lines (order matters). Used for all content fingerprints (disk albums and
+    folder trees)
+    """
+    h = hashlib.blake2b(digest_size=16)
 
-    return helper
+    for line in lines:
+        h.update(line.encode())
+        h.update(b"\n")
+
+    return h.hexdigest()
@@ -1,4 +1,6 @@
+import os
 from collections import defaultdict
+from operator import attrgetter
 from datetime import date
 from pathlib import PurePath, Path
 from typing import Generator, Dict, List
@@ -6,13 +8,18 @@ from typing import Generator, Dict, List
 from sync2smugmug import models
 from sync2smugmug.configuration import config
 
+# Files that do not count as content (a directory holding only these is considered empty)
+METADATA_FILE_EXTENSIONS = frozenset((".ini", ".json", ".info"))
+
 
 def dir_is_empty_of_pictures(disk_path: Path) -> bool:
     """ Return True only if directory is completely empty """
-    has_only_metadata_files = all(
-        not fp.is_dir() and fp.suffix in ('.ini', '.json', '.info')
-        for fp in disk_path.iterdir()
-    )
+    # scandir entries know their type from the listing itself (no stat per entry)
+    with os.scandir(disk_path) as it:
+        has_only_metadata_files = all(
+            not entry.is_dir() and os.path.splitext(entry.name)[1] in METADATA_FILE_EXTENSIONS
+            for entry in it
+        )
 
     return has_only_metadata_files
 
@@ -52,10 +59,18 @@ def iter_folders(root_folder: models.RootFolder) -> Generator[models.Album, None
 
 
 def _iter_folders(folder: models.Folder) -> Generator[models.Album, None, None]:
-    yield folder
+    """
+    Yield folders depth-first (parents before children). Uses an explicit stack rather than a recursive generator per
+    folder
+    """
+    stack: List[models.Folder] = [folder]
 
-    for sub_folder in folder.sub_folders.values():
-        yield from _iter_folders(sub_folder)
+    while stack:
+        folder = stack.pop()
+        yield folder
+
+        # Pushed in reverse order, so they are visited in order
+        stack.extend(reversed(folder.sub_folders.values()))
 
 
 def iter_albums(root_folder: models.RootFolder) -> Generator[models.Album, None, None]:
@@ -63,8 +78,18 @@ def iter_albums(root_folder: models.RootFolder) -> Generator[models.Album, None,
 
 
 def _iter_albums(folder: models.Folder) -> Generator[models.Album, None, None]:
-    for album in sorted(folder.albums.values(), key=lambda a: a.relative_path):
-        yield album
+    """
+    Yield albums depth-first (each folder's albums before its sub-folders', all in path order). Uses an explicit stack
+    rather than a recursive generator per folder.
+
+    Siblings share their parent path, so they are sorted by name (a plain string compare, rather than comparing paths)
+    """
+    stack: List[models.Folder] = [folder]
+
+    while stack:
+        folder = stack.pop()
+
+        yield from sorted(folder.albums.values(), key=attrgetter("name"))
 
-    for sub_folder in sorted(folder.sub_folders.values(), key=lambda sf: sf.relative_path):
-        yield from _iter_albums(sub_folder)
+        # Pushed in reverse order, so they are visited in path order
+        stack.extend(sorted(folder.sub_folders.values(), key=attrgetter("name"), reverse=True))
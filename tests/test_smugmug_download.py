@@ -0,0 +1,84 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+
+# The connection module needs its runtime dependencies (skip if they are not installed)
+for module_name in ("httpx", "authlib", "requests", "configargparse", "aioretry"):
+    pytest.importorskip(module_name)
+
+
+@pytest.fixture
+def smugmug(monkeypatch, tmp_path):
+    # The configuration is parsed from the command line on import - give it the required arguments
+    monkeypatch.setattr(sys, "argv", [
+        "sync2smugmug",
+        "--sync=online_backup",
+        f"--base_dir={tmp_path}",
+        "--account=account",
+        "--consumer_key=key",
+        "--consumer_secret=secret",
+        "--access_token=token",
+        "--access_token_secret=token_secret",
+    ])
+
+    return importlib.import_module("sync2smugmug.online.smugmug")
+
+
+def test_download_images_sharing_a_stem_concurrently(smugmug, tmp_path):
+    """ Images with the same stem (e.g. a live photo's jpg and mov) must not share a temp file while downloading """
+    connection = smugmug.SmugmugCoreConnection(connection_params=None)
+
+    chunks_by_uri = {
+        "/photo": [b"jpg-1", b"jpg-2"],
+        "/video": [b"mov-1", b"mov-2", b"mov-3"],
+    }
+
+    async def request_stream(absolute_uri: str):
+        for chunk in chunks_by_uri[absolute_uri.removeprefix(smugmug.SmugmugCoreConnection.API_BASE_URL)]:
+            # Let the other download run between chunks
+            await asyncio.sleep(0)
+            yield chunk
+
+    connection.request_stream = request_stream
+
+    async def download_both():
+        await asyncio.gather(
+            connection.request_download(image_uri="/photo", local_path=tmp_path.joinpath("IMG_1.jpg")),
+            connection.request_download(image_uri="/video", local_path=tmp_path.joinpath("IMG_1.mov")),
+        )
+
+    asyncio.run(download_both())
+
+    assert tmp_path.joinpath("IMG_1.jpg").read_bytes() == b"jpg-1jpg-2"
+    assert tmp_path.joinpath("IMG_1.mov").read_bytes() == b"mov-1mov-2mov-3"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_cancelled_download_leaves_no_temp_file(smugmug, tmp_path):
+    """ A download that fails, or is cancelled mid-stream because another one in its group failed, leaves no file """
+    connection = smugmug.SmugmugCoreConnection(connection_params=None)
+
+    async def request_stream(absolute_uri: str):
+        if absolute_uri.endswith("/photo"):
+            yield b"partial"
+            await asyncio.sleep(0)
+            raise RuntimeError("connection lost")
+
+        # Never completes (is cancelled when the other download fails)
+        while True:
+            await asyncio.sleep(0)
+            yield b"chunk"
+
+    connection.request_stream = request_stream
+
+    async def download_both():
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(connection.request_download(image_uri="/photo", local_path=tmp_path.joinpath("IMG_1.jpg")))
+            tg.create_task(connection.request_download(image_uri="/video", local_path=tmp_path.joinpath("IMG_1.mov")))
+
+    with pytest.raises(ExceptionGroup):
+        asyncio.run(download_both())
+
+    assert not list(tmp_path.glob("IMG_1.*"))